@@ -95,7 +95,7 @@ def atomic_write(
 def write_json_atomic(
     filepath: str | Path,
     data: Any,
-    indent: int = 2,
+    indent: int | None = 2,
     ensure_ascii: bool = False,
     encoding: str = "utf-8",
 ) -> None:
@@ -110,12 +110,15 @@ def write_json_atomic(
     Args:
         filepath: Target file path
         data: Data to serialize as JSON
-        indent: JSON indentation (default: 2)
+        indent: JSON indentation, or None for compact output (default: 2)
         ensure_ascii: Whether to escape non-ASCII characters (default: False)
         encoding: File encoding (default: "utf-8")
 
     Example:
         write_json_atomic("/path/to/file.json", {"key": "value"})
     """
+    # Serialize up front so the payload goes out in a single write() rather
+    # than the many small chunks json.dump() emits.
+    content = json.dumps(data, indent=indent, ensure_ascii=ensure_ascii)
     with atomic_write(filepath, "w", encoding=encoding) as f:
-        json.dump(data, f, indent=indent, ensure_ascii=ensure_ascii)
+        f.write(content)
@@ -26,7 +26,8 @@ from __future__ import annotations
 
 import logging
 import os
-from pathlib import Path, PurePosixPath, PureWindowsPath
+import re
+from pathlib import Path
 
 logger = logging.getLogger(__name__)
 
@@ -56,6 +57,13 @@ DEFAULT_STRATEGY_MAP: dict[str, DependencyStrategy] = {
     "go_modules": DependencyStrategy.SKIP,
 }
 
+# Rejects absolute paths and '..' traversals in both POSIX and Windows styles:
+# a leading separator (POSIX root, UNC, drive-rooted), a drive-absolute path
+# (e.g. "C:\x", "C:/x"), or a '..' component (including drive-relative "C:..").
+_UNSAFE_PATH_RE = re.compile(
+    r"^[/\\]|^[A-Za-z]:[/\\]|(?:^|[/\\]|^[A-Za-z]:)\.\.(?:[/\\]|$)"
+)
+
 
 def get_dependency_configs(
     project_index: dict | None,
@@ -107,10 +115,7 @@ def get_dependency_configs(
 
             # Path containment: reject absolute paths and traversals.
             # Check both POSIX and Windows path styles for cross-platform safety.
-            p = PurePosixPath(rel_path)
-            if p.is_absolute() or PureWindowsPath(rel_path).is_absolute():
-                continue
-            if ".." in p.parts or ".." in PureWindowsPath(rel_path).parts:
+            if _UNSAFE_PATH_RE.search(rel_path):
                 continue
 
             # Defense-in-depth: verify the resolved path stays within project_dir
@@ -129,13 +134,7 @@ def get_dependency_configs(
             # Validate requirements_file path containment too
             req_file = dep.get("requirements_file")
             if req_file:
-                rp = PurePosixPath(req_file)
-                if (
-                    rp.is_absolute()
-                    or PureWindowsPath(req_file).is_absolute()
-                    or ".." in rp.parts
-                    or ".." in PureWindowsPath(req_file).parts
-                ):
+                if _UNSAFE_PATH_RE.search(req_file):
                     req_file = None
 
                 # Defense-in-depth: resolved-path containment (matches rel_path check)
@@ -637,23 +637,12 @@ def setup_worktree_dependencies(
                     venv_path = worktree_path / config.source_rel_path
                     # Check if venv exists (symlinked or otherwise)
                     if venv_path.exists() or venv_path.is_symlink():
-                        if is_windows():
-                            python_bin = str(venv_path / "Scripts" / "python.exe")
-                        else:
-                            python_bin = str(venv_path / "bin" / "python")
-                        try:
-                            subprocess.run(
-                                [python_bin, "-c", "import sys; print(sys.prefix)"],
-                                capture_output=True,
-                                text=True,
-                                timeout=10,
-                                check=True,
-                            )
+                        if _check_venv_health(venv_path):
                             debug(
                                 MODULE,
                                 f"Symlinked venv health check passed: {config.source_rel_path}",
                             )
-                        except (subprocess.SubprocessError, OSError):
+                        else:
                             debug_warning(
                                 MODULE,
                                 f"Symlinked venv health check failed, falling back to recreate: {config.source_rel_path}",
@@ -694,6 +683,25 @@ def setup_worktree_dependencies(
     return results
 
 
+def _check_venv_health(venv_path: Path) -> bool:
+    """Return True if the venv's Python interpreter starts successfully."""
+    if is_windows():
+        python_bin = str(venv_path / "Scripts" / "python.exe")
+    else:
+        python_bin = str(venv_path / "bin" / "python")
+    try:
+        subprocess.run(
+            [python_bin, "-c", "import sys; print(sys.prefix)"],
+            capture_output=True,
+            text=True,
+            timeout=10,
+            check=True,
+        )
+    except (subprocess.SubprocessError, OSError):
+        return False
+    return True
+
+
 def _apply_symlink_strategy(
     project_dir: Path,
     worktree_path: Path,
@@ -2,12 +2,16 @@
 Competitor analysis functionality for roadmap generation.
 """
 
+import hashlib
 import json
+import mmap
+import os
+from collections.abc import Iterator
 from datetime import datetime
 from pathlib import Path
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Any
 
-from core.file_utils import write_json_atomic
+from core.file_utils import atomic_write, write_json_atomic
 from ui import muted, print_status
 
 from .models import RoadmapPhaseResult
@@ -15,8 +19,140 @@ from .models import RoadmapPhaseResult
 if TYPE_CHECKING:
     from .executor import AgentExecutor
 
+# orjson is an optional speedup; fall back to the stdlib encoder/decoder.
+# Input orjson rejects but json accepts (NaN/Infinity) is re-parsed with json,
+# and data orjson can't encode (integers beyond 64 bits) is written with json.
+# One difference remains: orjson parses integers beyond 64 bits as floats
+# rather than failing, so such values lose precision when orjson is installed.
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# ijson is optional; without it large analysis files are parsed in full
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
 MAX_RETRIES = 3
 
+# Analysis files larger than this are stream-parsed with ijson (when installed)
+# so only the competitors are materialized; below it a full parse is cheaper.
+STREAM_THRESHOLD_BYTES = 256 * 1024
+
+# Files at least this large are memory-mapped rather than read() when parsed
+# with orjson, avoiding a full copy of the file contents.
+MMAP_THRESHOLD_BYTES = 4 * 1024 * 1024
+
+# Read size used when hashing the analysis file for attempt fingerprints
+HASH_CHUNK_BYTES = 64 * 1024
+
+# Below this many existing competitors, merge dedupes with a list scan
+SMALL_MERGE_THRESHOLD = 8
+
+
+def _read_json(path: Path) -> Any:
+    """Read and parse a JSON file, using orjson when available.
+
+    The raw bytes are handed straight to the parser, skipping a separate
+    UTF-8 decode pass. With orjson, files of at least MMAP_THRESHOLD_BYTES
+    are parsed from a memory map instead of being copied into memory first.
+    """
+    with open(path, "rb") as f:
+        if orjson is None:
+            return json.loads(f.read())
+        if os.fstat(f.fileno()).st_size >= MMAP_THRESHOLD_BYTES:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                # Release the view before the map is closed
+                with memoryview(mm) as view:
+                    return _orjson_loads(view)
+        return _orjson_loads(f.read())
+
+
+def _orjson_loads(data: bytes | memoryview) -> Any:
+    """Parse with orjson, retrying with json for input only json accepts.
+
+    orjson rejects NaN and Infinity, which json reads as floats. Malformed
+    input fails both parsers; the error raised is then json's.
+    """
+    try:
+        return orjson.loads(data)
+    except orjson.JSONDecodeError:
+        return json.loads(bytes(data))
+
+
+class _StreamParseError(ValueError):
+    """A streamed JSON file turned out to be malformed.
+
+    Carries the first line of ijson's message; unlike json.JSONDecodeError it
+    has no line/column position, since ijson backends don't report one.
+    """
+
+    @classmethod
+    def from_ijson(cls, error: Exception) -> "_StreamParseError":
+        """Build from an ijson error, keeping a readable one-line message.
+
+        The yajl backends append a multi-line caret dump, and report invalid
+        UTF-8 input with a bytes message.
+        """
+        message = error.args[0] if error.args else error
+        if isinstance(message, bytes):
+            message = message.decode("utf-8", errors="replace")
+        first_line = str(message).strip().partition("\n")[0]
+        return cls(first_line or type(error).__name__)
+
+
+def _stream_items(path: Path, prefix: str) -> Iterator[Any]:
+    """Yield the JSON values found at *prefix* without loading the whole file.
+
+    Raises:
+        _StreamParseError: If ijson hits malformed JSON while streaming.
+    """
+    with open(path, "rb") as f:
+        try:
+            yield from ijson.items(f, prefix, use_float=True)
+        except ijson.JSONError as e:
+            raise _StreamParseError.from_ijson(e) from e
+
+
+def _timestamp() -> str:
+    """Return the current local time as an ISO 8601 string with second precision."""
+    return datetime.now().isoformat(timespec="seconds")
+
+
+def _make_skeleton(**fields: Any) -> dict:
+    """Build an empty analysis document, with *fields* placed first."""
+    return {
+        **fields,
+        "competitors": [],
+        "market_gaps": [],
+        "insights_summary": {
+            "top_pain_points": [],
+            "differentiator_opportunities": [],
+            "market_trends": [],
+        },
+        "created_at": _timestamp(),
+    }
+
+
+def _write_json(path: Path, data: Any) -> None:
+    """Atomically write JSON data, using orjson when available.
+
+    Output is compact; set COMPETITOR_PRETTY=1 to indent it for debugging.
+    """
+    pretty = os.environ.get("COMPETITOR_PRETTY", "").lower() in ("true", "1")
+    if orjson is not None:
+        try:
+            payload = orjson.dumps(data, option=orjson.OPT_INDENT_2 if pretty else 0)
+        except TypeError:
+            pass  # e.g. an integer beyond 64 bits; json can encode it
+        else:
+            with atomic_write(path, "wb") as f:
+                f.write(payload)
+            return
+    write_json_atomic(path, data, indent=2 if pretty else None)
+
 
 class CompetitorAnalyzer:
     """Analyzes competitors and market gaps for roadmap generation."""
@@ -34,6 +170,9 @@ class CompetitorAnalyzer:
         self.manual_competitors_file = output_dir / "manual_competitors.json"
         self.discovery_file = output_dir / "roadmap_discovery.json"
         self.project_index_file = output_dir / "project_index.json"
+        # (st_size, st_mtime_ns, parsed data) of the last analysis file read,
+        # cleared when analyze() returns
+        self._analysis_cache: tuple[int, int, dict] | None = None
 
     async def analyze(self, enabled: bool = False) -> RoadmapPhaseResult:
         """Run competitor analysis to research competitors and user feedback (if enabled).
@@ -41,9 +180,33 @@ class CompetitorAnalyzer:
         This is an optional phase - it gracefully degrades if disabled or if analysis fails.
         Competitor insights enhance roadmap features but are not required.
         """
+        try:
+            return await self._analyze(enabled)
+        finally:
+            # The analyzer outlives the phase; don't hold a parsed document
+            self._analysis_cache = None
+
+    async def _analyze(self, enabled: bool) -> RoadmapPhaseResult:
+        """Body of analyze(); the parse cache is only valid for its duration."""
+        # One stat snapshot serves both the "already exists" check and the
+        # manual competitor read below
+        try:
+            analysis_stat = os.stat(self.analysis_file)
+        except FileNotFoundError:
+            analysis_stat = None
+
+        if enabled and analysis_stat is not None and not self.refresh:
+            print_status("competitor_analysis.json already exists", "success")
+            return RoadmapPhaseResult(
+                "competitor_analysis", True, [str(self.analysis_file)], [], 0
+            )
+
+        # Preserve manual competitors before any path that overwrites the file.
+        # Their sources are fixed for the whole run, so they are read only once.
+        manual_competitors = self._get_manual_competitors(analysis_stat)
+
         if not enabled:
             print_status("Competitor analysis not enabled, skipping", "info")
-            manual_competitors = self._get_manual_competitors()
             self._create_disabled_analysis_file()
             if manual_competitors:
                 self._merge_manual_competitors(manual_competitors)
@@ -51,15 +214,6 @@ class CompetitorAnalyzer:
                 "competitor_analysis", True, [str(self.analysis_file)], [], 0
             )
 
-        if self.analysis_file.exists() and not self.refresh:
-            print_status("competitor_analysis.json already exists", "success")
-            return RoadmapPhaseResult(
-                "competitor_analysis", True, [str(self.analysis_file)], [], 0
-            )
-
-        # Preserve manual competitors before any path that overwrites the file
-        manual_competitors = self._get_manual_competitors()
-
         if not self.discovery_file.exists():
             print_status(
                 "Discovery file not found, skipping competitor analysis", "warning"
@@ -77,26 +231,43 @@ class CompetitorAnalyzer:
                 0,
             )
 
+        # The context only depends on paths fixed at construction time
+        context = self._build_context()
         errors = []
+        # Fingerprints of attempts that failed validation, see _attempt_fingerprint()
+        failed_attempts: set[bytes] = set()
         for attempt in range(MAX_RETRIES):
             print_status(
                 f"Running competitor analysis agent (attempt {attempt + 1})...",
                 "progress",
             )
 
-            context = self._build_context()
             success, output = await self.agent_executor.run_agent(
                 "competitor_analysis.md",
                 additional_context=context,
             )
 
-            if success and self.analysis_file.exists():
-                validation_result = self._validate_analysis()
-                if validation_result is not None:
-                    if manual_competitors:
-                        self._merge_manual_competitors(manual_competitors)
-                    return validation_result
+            if success:
+                try:
+                    result = self._finalize_analysis(manual_competitors)
+                except FileNotFoundError:
+                    result = None
+                    success = False
+                if result is not None:
+                    return result
+
+            if success:
                 errors.append(f"Attempt {attempt + 1}: Validation failed")
+                # Identical inputs producing identical invalid output is a
+                # deterministic failure; further retries would only repeat it
+                fingerprint = self._attempt_fingerprint(context)
+                if fingerprint in failed_attempts:
+                    print_status(
+                        "Agent repeated the same invalid analysis, not retrying",
+                        "warning",
+                    )
+                    break
+                failed_attempts.add(fingerprint)
             else:
                 errors.append(
                     f"Attempt {attempt + 1}: Agent did not create competitor analysis file"
@@ -116,53 +287,83 @@ class CompetitorAnalyzer:
 
         # Return success=True for graceful degradation (don't block roadmap generation)
         return RoadmapPhaseResult(
-            "competitor_analysis", True, [str(self.analysis_file)], errors, MAX_RETRIES
+            "competitor_analysis", True, [str(self.analysis_file)], errors, len(errors)
         )
 
-    def _get_manual_competitors(self) -> list[dict]:
+    def _get_manual_competitors(
+        self, analysis_stat: os.stat_result | None
+    ) -> dict[str, dict]:
         """Extract manually-added competitors from the dedicated manual file and analysis file.
 
         Reads from manual_competitors.json (primary, never overwritten by agent) and
         falls back to competitor_analysis.json. Deduplicates by competitor ID.
-        Returns a list of competitor dicts where source == 'manual'.
+        Returns a dict of competitor ID -> competitor dict where source == 'manual'.
+
+        Args:
+            analysis_stat: Caller's stat of the analysis file, or None if it
+                does not exist (the fallback read is then skipped).
         """
         competitors_by_id: dict[str, dict] = {}
 
         # Primary source: dedicated manual competitors file (never overwritten by agent)
-        if self.manual_competitors_file.exists():
-            try:
-                with open(self.manual_competitors_file, encoding="utf-8") as f:
-                    data = json.load(f)
-                for c in data.get("competitors", []):
-                    if isinstance(c, dict) and c.get("id"):
-                        competitors_by_id[c["id"]] = c
-            except (json.JSONDecodeError, OSError) as e:
-                print_status(
-                    f"Warning: could not read manual competitors file: {e}", "warning"
-                )
+        try:
+            data = _read_json(self.manual_competitors_file)
+            for c in data.get("competitors", []):
+                try:
+                    cid = c.get("id")
+                except AttributeError:  # not a JSON object
+                    continue
+                if cid:
+                    competitors_by_id[cid] = c
+        except FileNotFoundError:
+            pass
+        except (json.JSONDecodeError, UnicodeDecodeError, OSError) as e:
+            print_status(
+                f"Warning: could not read manual competitors file: {e}", "warning"
+            )
 
         # Fallback: also check analysis file for manual competitors
-        if self.analysis_file.exists():
-            try:
-                with open(self.analysis_file, encoding="utf-8") as f:
-                    data = json.load(f)
-                for c in data.get("competitors", []):
-                    if (
-                        isinstance(c, dict)
-                        and c.get("source") == "manual"
-                        and c.get("id")
-                        and c["id"] not in competitors_by_id
-                    ):
-                        competitors_by_id[c["id"]] = c
-            except (json.JSONDecodeError, OSError) as e:
-                print_status(
-                    f"Warning: could not read manual competitors from analysis: {e}",
-                    "warning",
-                )
+        if analysis_stat is None:
+            return competitors_by_id
+
+        # Collected separately so a file that turns out to be malformed part
+        # way through a stream contributes nothing, as with a full parse
+        from_analysis: dict[str, dict] = {}
+        try:
+            competitors = self._stream_competitors(analysis_stat)
+            if competitors is None:
+                competitors = self._load_analysis(analysis_stat).get("competitors", [])
+            for c in competitors:
+                try:
+                    cid = c.get("id")
+                    is_manual = c.get("source") == "manual"
+                except AttributeError:  # not a JSON object
+                    continue
+                if (
+                    is_manual
+                    and cid
+                    and cid not in competitors_by_id
+                    and cid not in from_analysis
+                ):
+                    from_analysis[cid] = c
+        except FileNotFoundError:
+            pass
+        except (
+            json.JSONDecodeError,
+            UnicodeDecodeError,
+            _StreamParseError,
+            OSError,
+        ) as e:
+            print_status(
+                f"Warning: could not read manual competitors from analysis: {e}",
+                "warning",
+            )
+        else:
+            competitors_by_id.update(from_analysis)
 
-        return list(competitors_by_id.values())
+        return competitors_by_id
 
-    def _merge_manual_competitors(self, manual_competitors: list[dict]) -> None:
+    def _merge_manual_competitors(self, manual_competitors: dict[str, dict]) -> None:
         """Merge manual competitors back into the newly-generated analysis file.
 
         Appends manual competitors that don't already exist (by ID) in the file.
@@ -171,21 +372,123 @@ class CompetitorAnalyzer:
             return
 
         try:
-            with open(self.analysis_file, encoding="utf-8") as f:
-                data = json.load(f)
-        except (json.JSONDecodeError, OSError) as e:
+            data = self._load_analysis()
+        except (json.JSONDecodeError, UnicodeDecodeError, OSError) as e:
             print_status(f"Warning: failed to merge manual competitors: {e}", "warning")
             return
 
-        existing_ids = {
-            c.get("id") for c in data.get("competitors", []) if isinstance(c, dict)
-        }
+        self._add_manual_competitors(data, manual_competitors)
+        self._write_analysis(data)
+
+    @staticmethod
+    def _add_manual_competitors(
+        data: dict, manual_competitors: dict[str, dict]
+    ) -> None:
+        """Append manual competitors not already present (by ID) to *data* in place."""
+        competitors = data.setdefault("competitors", [])
+        if not competitors:
+            # Nothing to dedupe against (e.g. the disabled/error skeletons)
+            competitors.extend(manual_competitors.values())
+            return
+
+        ids = [c.get("id") for c in competitors if isinstance(c, dict)]
+        # A linear scan of a handful of IDs is cheaper than hashing them into a set
+        existing_ids = ids if len(ids) < SMALL_MERGE_THRESHOLD else set(ids)
+        competitors.extend(
+            [c for cid, c in manual_competitors.items() if cid not in existing_ids]
+        )
+
+    def _load_analysis(self, st: os.stat_result | None = None) -> dict:
+        """Load the analysis file, reusing the last parse if the file is unchanged.
 
-        for competitor in manual_competitors:
-            if competitor.get("id") not in existing_ids:
-                data.setdefault("competitors", []).append(competitor)
+        The cache is keyed by file size and mtime, so any rewrite of the file
+        (by the agent or by this class) forces a fresh parse.
 
-        write_json_atomic(self.analysis_file, data, indent=2)
+        Args:
+            st: A current stat of the analysis file, if the caller has one.
+
+        Raises:
+            OSError: If the file cannot be stat'ed or read.
+            json.JSONDecodeError: If the file is not valid JSON.
+        """
+        if st is None:
+            st = os.stat(self.analysis_file)
+        cached = self._analysis_cache
+        if (
+            cached is not None
+            and cached[0] == st.st_size
+            and cached[1] == st.st_mtime_ns
+        ):
+            return cached[2]
+
+        data = _read_json(self.analysis_file)
+        self._analysis_cache = (st.st_size, st.st_mtime_ns, data)
+        return data
+
+    def _stream_competitors(
+        self, st: os.stat_result | None = None
+    ) -> Iterator[Any] | None:
+        """Stream the analysis file's competitors if the file is large.
+
+        Returns None when ijson is unavailable or the file is at most
+        STREAM_THRESHOLD_BYTES, in which case the caller should do a full parse.
+
+        Args:
+            st: A current stat of the analysis file, if the caller has one.
+
+        Raises:
+            FileNotFoundError: If the analysis file does not exist.
+        """
+        if ijson is None:
+            return None
+        if st is None:
+            st = os.stat(self.analysis_file)
+        if st.st_size <= STREAM_THRESHOLD_BYTES:
+            return None
+        return _stream_items(self.analysis_file, "competitors.item")
+
+    def _stream_competitor_counts(self) -> tuple[int, int] | None:
+        """Count competitors and pain points by streaming a large analysis file.
+
+        Returns None if streaming does not apply or yielded no competitors; the
+        caller then does a full parse, which also checks the key is present.
+        """
+        competitors = self._stream_competitors()
+        if competitors is None:
+            return None
+
+        competitor_count = pain_point_count = 0
+        for c in competitors:
+            competitor_count += 1
+            pain_point_count += len(c.get("pain_points", []))
+        return (competitor_count, pain_point_count) if competitor_count else None
+
+    def _write_analysis(self, data: dict) -> None:
+        """Atomically write the analysis file and invalidate the parse cache."""
+        self._analysis_cache = None
+        _write_json(self.analysis_file, data)
+
+    def _attempt_fingerprint(self, context: str) -> bytes:
+        """Fingerprint an agent attempt by its inputs and the output it left behind.
+
+        Covers the agent context, the discovery and project index mtimes, and
+        the analysis file contents. The file is hashed in chunks so a large
+        output is never read into memory whole.
+        """
+        h = hashlib.blake2b(context.encode(), digest_size=16)
+        for path in (self.discovery_file, self.project_index_file):
+            try:
+                h.update(str(os.stat(path).st_mtime_ns).encode())
+            except FileNotFoundError:
+                h.update(b"-")
+            h.update(b"\0")
+        try:
+            with open(self.analysis_file, "rb") as f:
+                while chunk := f.read(HASH_CHUNK_BYTES):
+                    h.update(chunk)
+        except FileNotFoundError:
+            pass
+        return h.digest()
 
     def _build_context(self) -> str:
         """Build context string for the competitor analysis agent."""
@@ -199,70 +502,66 @@ Use WebSearch to find competitors and analyze user feedback (reviews, complaints
 Output your findings to competitor_analysis.json.
 """
 
-    def _validate_analysis(self) -> RoadmapPhaseResult | None:
-        """Validate the competitor analysis file.
+    def _finalize_analysis(
+        self, manual_competitors: dict[str, dict]
+    ) -> RoadmapPhaseResult | None:
+        """Validate the agent's analysis file and merge manual competitors into it.
+
+        The file is parsed once; it is only rewritten when there are manual
+        competitors to merge back in.
 
         Returns RoadmapPhaseResult if validation succeeds, None otherwise.
+
+        Raises:
+            FileNotFoundError: If the agent did not create the analysis file.
         """
         try:
-            with open(self.analysis_file, encoding="utf-8") as f:
-                data = json.load(f)
-
-            if "competitors" in data:
-                competitor_count = len(data.get("competitors", []))
-                pain_point_count = sum(
-                    len(c.get("pain_points", [])) for c in data.get("competitors", [])
-                )
-                print_status(
-                    f"Analyzed {competitor_count} competitors, found {pain_point_count} pain points",
-                    "success",
-                )
-                return RoadmapPhaseResult(
-                    "competitor_analysis", True, [str(self.analysis_file)], [], 0
-                )
-
-        except json.JSONDecodeError as e:
+            # Without manual competitors to merge only the counts are needed
+            counts = None if manual_competitors else self._stream_competitor_counts()
+            if counts is None:
+                data = self._load_analysis()
+        except (json.JSONDecodeError, UnicodeDecodeError, _StreamParseError) as e:
             print_status(
                 f"Warning: competitor analysis file is not valid JSON: {e}",
                 "warning",
             )
+            return None
+
+        if counts is None:
+            if "competitors" not in data:
+                return None
+            competitors = data.get("competitors", [])
+            counts = (
+                len(competitors),
+                sum(len(c.get("pain_points", [])) for c in competitors),
+            )
 
-        return None
+        competitor_count, pain_point_count = counts
+        print_status(
+            f"Analyzed {competitor_count} competitors, found {pain_point_count} pain points",
+            "success",
+        )
+
+        if manual_competitors:
+            self._add_manual_competitors(data, manual_competitors)
+            self._write_analysis(data)
+
+        return RoadmapPhaseResult(
+            "competitor_analysis", True, [str(self.analysis_file)], [], 0
+        )
 
     def _create_disabled_analysis_file(self):
         """Create an analysis file indicating the feature is disabled."""
-        write_json_atomic(
-            self.analysis_file,
-            {
-                "enabled": False,
-                "reason": "Competitor analysis not enabled by user",
-                "competitors": [],
-                "market_gaps": [],
-                "insights_summary": {
-                    "top_pain_points": [],
-                    "differentiator_opportunities": [],
-                    "market_trends": [],
-                },
-                "created_at": datetime.now().isoformat(),
-            },
-            indent=2,
+        self._write_analysis(
+            _make_skeleton(
+                enabled=False, reason="Competitor analysis not enabled by user"
+            )
         )
 
     def _create_error_analysis_file(self, error: str, errors: list[str] | None = None):
         """Create an analysis file with error information."""
-        data = {
-            "enabled": True,
-            "error": error,
-            "competitors": [],
-            "market_gaps": [],
-            "insights_summary": {
-                "top_pain_points": [],
-                "differentiator_opportunities": [],
-                "market_trends": [],
-            },
-            "created_at": datetime.now().isoformat(),
-        }
+        data = _make_skeleton(enabled=True, error=error)
         if errors:
             data["errors"] = errors
 
-        write_json_atomic(self.analysis_file, data, indent=2)
+        self._write_analysis(data)
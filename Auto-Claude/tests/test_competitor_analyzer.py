@@ -0,0 +1,453 @@
+#!/usr/bin/env python3
+"""
+Tests for Competitor Analyzer
+=============================
+
+Tests the competitor_analyzer.py functionality including:
+- Analysis file parse cache (reuse, invalidation, release after analyze())
+- JSON backends: stdlib fallback, orjson, and ijson streaming of large files
+- Compact vs COMPETITOR_PRETTY output layout
+- Agent retries and the repeated-invalid-output short-circuit
+- Merging manual competitors back into agent and skeleton analysis files
+"""
+
+import json
+import math
+import os
+from pathlib import Path
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+import runners.roadmap.competitor_analyzer as competitor_analyzer
+from runners.roadmap.competitor_analyzer import CompetitorAnalyzer
+
+
+def _write(path: Path, data: dict) -> None:
+    """Write *data* as JSON to *path*."""
+    path.write_text(json.dumps(data))
+
+
+@pytest.fixture
+def analyzer(tmp_path: Path) -> CompetitorAnalyzer:
+    """CompetitorAnalyzer writing to tmp_path, with a mock agent executor."""
+    return CompetitorAnalyzer(tmp_path, refresh=True, agent_executor=MagicMock())
+
+
+@pytest.fixture(params=["stdlib", "orjson", "ijson-streaming"])
+def json_backend(request, monkeypatch) -> str:
+    """Run a test once per JSON backend the analyzer can use.
+
+    - stdlib: orjson and ijson patched out, so every read is a full json parse.
+    - orjson: the mmap threshold is lowered so any non-empty file is parsed
+      from a memory map.
+    - ijson-streaming: the stream threshold is zeroed so analysis files are
+      streamed; other files take orjson's plain read() path.
+    """
+    backend = request.param
+    if backend == "stdlib":
+        monkeypatch.setattr(competitor_analyzer, "orjson", None)
+        monkeypatch.setattr(competitor_analyzer, "ijson", None)
+    elif backend == "orjson":
+        if competitor_analyzer.orjson is None:
+            pytest.skip("orjson not installed")
+        monkeypatch.setattr(competitor_analyzer, "ijson", None)
+        monkeypatch.setattr(competitor_analyzer, "MMAP_THRESHOLD_BYTES", 1)
+    else:
+        if competitor_analyzer.ijson is None:
+            pytest.skip("ijson not installed")
+        monkeypatch.setattr(competitor_analyzer, "STREAM_THRESHOLD_BYTES", 0)
+    return backend
+
+
+@pytest.fixture
+def read_json_spy():
+    """Spy on the module's JSON reader to count full parses."""
+    with patch.object(
+        competitor_analyzer, "_read_json", wraps=competitor_analyzer._read_json
+    ) as spy:
+        yield spy
+
+
+class TestAnalysisParseCache:
+    """Tests for the stat-keyed analysis file parse cache."""
+
+    def test_unchanged_file_parsed_once(
+        self, analyzer: CompetitorAnalyzer, read_json_spy: MagicMock
+    ):
+        """Repeated loads of an unchanged file reuse the first parse."""
+        _write(analyzer.analysis_file, {"competitors": [{"id": "a"}]})
+
+        first = analyzer._load_analysis()
+        second = analyzer._load_analysis()
+
+        assert second is first
+        read_json_spy.assert_called_once()
+
+    @pytest.mark.parametrize(
+        "same_size",
+        [
+            pytest.param(False, id="new-size"),
+            pytest.param(True, id="same-size-new-mtime"),
+        ],
+    )
+    def test_rewrite_forces_fresh_parse(
+        self, analyzer: CompetitorAnalyzer, read_json_spy: MagicMock, same_size: bool
+    ):
+        """A rewrite by someone else (e.g. the agent) changes the cache key."""
+        _write(analyzer.analysis_file, {"competitors": [{"id": "a"}]})
+        analyzer._load_analysis()
+        mtime_ns = os.stat(analyzer.analysis_file).st_mtime_ns
+
+        competitor_id = "b" if same_size else "bbbb"
+        _write(analyzer.analysis_file, {"competitors": [{"id": competitor_id}]})
+        # Pin the mtime so only the intended part of the key changes
+        new_mtime_ns = mtime_ns + 1_000_000_000 if same_size else mtime_ns
+        os.utime(analyzer.analysis_file, ns=(new_mtime_ns, new_mtime_ns))
+
+        data = analyzer._load_analysis()
+
+        assert data["competitors"] == [{"id": competitor_id}]
+        assert read_json_spy.call_count == 2
+
+    def test_write_analysis_invalidates_cache(self, analyzer: CompetitorAnalyzer):
+        """_write_analysis() drops the cache even if size and mtime collide."""
+        _write(analyzer.analysis_file, {"competitors": [{"id": "a"}]})
+        analyzer._load_analysis()
+        st = os.stat(analyzer.analysis_file)
+
+        analyzer._write_analysis({"competitors": [{"id": "b"}]})
+        # Simulate a coarse-mtime filesystem: same size, same mtime
+        os.utime(analyzer.analysis_file, ns=(st.st_atime_ns, st.st_mtime_ns))
+
+        assert analyzer._analysis_cache is None
+        assert analyzer._load_analysis()["competitors"] == [{"id": "b"}]
+
+    @pytest.mark.asyncio
+    async def test_cache_released_after_analyze(self, analyzer: CompetitorAnalyzer):
+        """analyze() does not keep a parsed document alive after it returns."""
+        _write(analyzer.discovery_file, {})
+
+        async def run_agent(*args, **kwargs):
+            _write(analyzer.analysis_file, {"competitors": [{"id": "a"}]})
+            return True, ""
+
+        analyzer.agent_executor.run_agent = run_agent
+
+        # A valid analysis with no manual competitors is parsed but not rewritten
+        result = await analyzer.analyze(enabled=True)
+
+        assert result.success and not result.errors
+        assert analyzer._analysis_cache is None
+
+
+class TestJsonBackends:
+    """Tests that every JSON backend reads analysis files the same way."""
+
+    def test_manual_competitors_from_analysis_file(
+        self, analyzer: CompetitorAnalyzer, json_backend: str
+    ):
+        """Manual competitors are picked out; the manual file takes precedence."""
+        _write(
+            analyzer.manual_competitors_file,
+            {"competitors": [{"id": "m2", "name": "primary"}]},
+        )
+        _write(
+            analyzer.analysis_file,
+            {
+                "competitors": [
+                    {"id": "m1", "source": "manual"},
+                    {"id": "a1", "source": "agent"},
+                    "junk",
+                    {"id": "m2", "source": "manual", "name": "fallback"},
+                ]
+            },
+        )
+
+        manual = analyzer._get_manual_competitors(os.stat(analyzer.analysis_file))
+
+        assert list(manual) == ["m2", "m1"]
+        assert manual["m2"]["name"] == "primary"
+
+    def test_nan_and_infinity_accepted(
+        self, analyzer: CompetitorAnalyzer, json_backend: str
+    ):
+        """Values the stdlib json accepts still load when orjson is installed."""
+        analyzer.manual_competitors_file.write_text(
+            '{"competitors": [{"id": "m1", "score": NaN, "reach": Infinity}]}'
+        )
+
+        manual = analyzer._get_manual_competitors(None)
+
+        assert math.isnan(manual["m1"]["score"])
+        assert manual["m1"]["reach"] == math.inf
+
+    @pytest.mark.parametrize(
+        "pretty_env,indented",
+        [
+            pytest.param(None, False, id="compact-by-default"),
+            pytest.param("0", False, id="compact-when-disabled"),
+            pytest.param("1", True, id="pretty-1"),
+            pytest.param("TRUE", True, id="pretty-true"),
+        ],
+    )
+    def test_write_json_layout(
+        self,
+        analyzer: CompetitorAnalyzer,
+        json_backend: str,
+        monkeypatch,
+        pretty_env: str | None,
+        indented: bool,
+    ):
+        """Output is compact unless COMPETITOR_PRETTY asks for indentation."""
+        if pretty_env is None:
+            monkeypatch.delenv("COMPETITOR_PRETTY", raising=False)
+        else:
+            monkeypatch.setenv("COMPETITOR_PRETTY", pretty_env)
+        data = {"competitors": [{"id": "a", "pain_points": ["slow"]}]}
+
+        competitor_analyzer._write_json(analyzer.analysis_file, data)
+
+        raw = analyzer.analysis_file.read_bytes()
+        assert json.loads(raw) == data
+        if indented:
+            assert b'\n  "competitors": [\n' in raw
+        else:
+            assert b"\n" not in raw
+
+    def test_integer_beyond_64_bits_written(
+        self, analyzer: CompetitorAnalyzer, json_backend: str
+    ):
+        """Data orjson cannot encode is still written intact."""
+        competitor_analyzer._write_json(analyzer.analysis_file, {"n": 2**70})
+
+        assert json.loads(analyzer.analysis_file.read_text()) == {"n": 2**70}
+
+    def test_finalize_counts_competitors_and_pain_points(
+        self, analyzer: CompetitorAnalyzer, json_backend: str, capsys
+    ):
+        """Validation reports the same counts whichever backend parses the file."""
+        _write(
+            analyzer.analysis_file,
+            {
+                "competitors": [
+                    {"id": "a", "pain_points": ["slow", "pricey"]},
+                    {"id": "b", "pain_points": ["buggy"]},
+                ]
+            },
+        )
+
+        result = analyzer._finalize_analysis({})
+
+        assert result is not None and result.success
+        assert "Analyzed 2 competitors, found 3 pain points" in capsys.readouterr().out
+
+    @pytest.mark.parametrize(
+        "corrupt",
+        [
+            pytest.param(lambda doc: doc[:-10], id="truncated"),
+            # The last competitor's source holds a byte that isn't UTF-8
+            pytest.param(
+                lambda doc: doc[:-20] + doc[-20:].replace(b"manual", b"man\xffual"),
+                id="invalid-utf8",
+            ),
+        ],
+    )
+    def test_corrupt_analysis_file_contributes_nothing(
+        self, analyzer: CompetitorAnalyzer, json_backend: str, capsys, corrupt
+    ):
+        """Competitors read before a parse error are discarded, not kept."""
+        doc = json.dumps(
+            {"competitors": [{"id": f"m{i}", "source": "manual"} for i in range(50)]}
+        ).encode()
+        analyzer.analysis_file.write_bytes(corrupt(doc))
+
+        manual = analyzer._get_manual_competitors(os.stat(analyzer.analysis_file))
+
+        assert manual == {}
+        out = capsys.readouterr().out
+        assert "could not read manual competitors from analysis" in out
+        # One readable line: no yajl caret dump, bytes repr or made-up position
+        assert len(out.strip().splitlines()) == 1
+        assert "(right here)" not in out
+        assert "b'" not in out
+        if json_backend == "ijson-streaming":
+            assert "line 1 column 1" not in out
+
+    def test_truncated_agent_output_fails_validation(
+        self, analyzer: CompetitorAnalyzer, json_backend: str, capsys
+    ):
+        """Malformed agent output is reported and fails validation."""
+        analyzer.analysis_file.write_text('{"competitors": [{"id": "a"}, {"id"')
+
+        assert analyzer._finalize_analysis({}) is None
+        assert "not valid JSON" in capsys.readouterr().out
+
+
+class TestAgentRetries:
+    """Tests for the analysis agent retry loop."""
+
+    @pytest.fixture
+    def run_agent(self, analyzer: CompetitorAnalyzer) -> AsyncMock:
+        """Stub run_agent; tests set the outputs it writes via side_effect."""
+        _write(analyzer.discovery_file, {})
+        mock = AsyncMock()
+        analyzer.agent_executor.run_agent = mock
+        return mock
+
+    @staticmethod
+    def _writes(analyzer: CompetitorAnalyzer, outputs: list[str]):
+        """side_effect writing each of *outputs* in turn, as the agent would."""
+        remaining = iter(outputs)
+
+        async def side_effect(*args, **kwargs):
+            analyzer.analysis_file.write_text(next(remaining))
+            return True, ""
+
+        return side_effect
+
+    @pytest.mark.asyncio
+    async def test_repeated_invalid_output_stops_retrying(
+        self, analyzer: CompetitorAnalyzer, run_agent: AsyncMock
+    ):
+        """Identical invalid output on an identical input ends the loop early."""
+        run_agent.side_effect = self._writes(analyzer, ["{not json"] * 3)
+
+        result = await analyzer.analyze(enabled=True)
+
+        assert run_agent.await_count == 2
+        assert result.retries == 2
+        assert result.errors == [
+            "Attempt 1: Validation failed",
+            "Attempt 2: Validation failed",
+        ]
+
+    @pytest.mark.asyncio
+    async def test_changing_invalid_output_uses_all_attempts(
+        self, analyzer: CompetitorAnalyzer, run_agent: AsyncMock
+    ):
+        """Invalid output that differs between attempts is retried every time."""
+        run_agent.side_effect = self._writes(
+            analyzer, [json.dumps({"attempt": n}) for n in range(3)]
+        )
+
+        result = await analyzer.analyze(enabled=True)
+
+        assert run_agent.await_count == competitor_analyzer.MAX_RETRIES
+        assert result.retries == competitor_analyzer.MAX_RETRIES
+
+    @pytest.mark.asyncio
+    async def test_fingerprints_not_carried_across_runs(
+        self, analyzer: CompetitorAnalyzer, run_agent: AsyncMock
+    ):
+        """A second analyze() call does not stop on the first run's failures."""
+        run_agent.side_effect = self._writes(analyzer, ["{not json"] * 4)
+
+        await analyzer.analyze(enabled=True)
+        result = await analyzer.analyze(enabled=True)
+
+        assert run_agent.await_count == 4
+        assert result.retries == 2
+
+    def test_fingerprint_covers_whole_file(
+        self, analyzer: CompetitorAnalyzer, monkeypatch
+    ):
+        """Output differing only past the first hash chunk changes the fingerprint."""
+        monkeypatch.setattr(competitor_analyzer, "HASH_CHUNK_BYTES", 4)
+        analyzer.analysis_file.write_text('{"competitors": [1]}')
+        first = analyzer._attempt_fingerprint("context")
+        analyzer.analysis_file.write_text('{"competitors": [2]}')
+
+        assert analyzer._attempt_fingerprint("context") != first
+
+
+class TestManualCompetitorMerge:
+    """Tests for merging manual competitors back into the analysis file."""
+
+    @pytest.fixture
+    def manual_file(self, analyzer: CompetitorAnalyzer) -> None:
+        """Manual competitors file; a1 clashes with an agent competitor."""
+        _write(
+            analyzer.manual_competitors_file,
+            {
+                "competitors": [
+                    {"id": "a1", "name": "manual copy", "source": "manual"},
+                    {"id": "m1", "name": "mine", "source": "manual"},
+                ]
+            },
+        )
+
+    @pytest.mark.asyncio
+    async def test_merged_into_agent_analysis(
+        self, analyzer: CompetitorAnalyzer, manual_file: None
+    ):
+        """Agent entries win on ID clashes; new manual entries are appended once."""
+        _write(analyzer.discovery_file, {})
+
+        async def run_agent(*args, **kwargs):
+            _write(
+                analyzer.analysis_file,
+                {"competitors": [{"id": "a1", "name": "agent"}, {"id": "a2"}]},
+            )
+            return True, ""
+
+        analyzer.agent_executor.run_agent = run_agent
+
+        result = await analyzer.analyze(enabled=True)
+
+        assert result.success and not result.errors
+        competitors = json.loads(analyzer.analysis_file.read_text())["competitors"]
+        assert [c["id"] for c in competitors] == ["a1", "a2", "m1"]
+        assert competitors[0]["name"] == "agent"
+
+    @pytest.mark.parametrize(
+        "enabled,has_discovery,skeleton_key",
+        [
+            pytest.param(False, True, "reason", id="disabled-skeleton"),
+            pytest.param(True, False, "error", id="error-skeleton"),
+        ],
+    )
+    @pytest.mark.asyncio
+    async def test_merged_into_empty_skeleton(
+        self,
+        analyzer: CompetitorAnalyzer,
+        manual_file: None,
+        enabled: bool,
+        has_discovery: bool,
+        skeleton_key: str,
+    ):
+        """Skeletons have no competitors, so every manual one is appended as-is."""
+        if has_discovery:
+            _write(analyzer.discovery_file, {})
+
+        await analyzer.analyze(enabled=enabled)
+
+        data = json.loads(analyzer.analysis_file.read_text())
+        assert skeleton_key in data
+        assert [c["id"] for c in data["competitors"]] == ["a1", "m1"]
+        analyzer.agent_executor.run_agent.assert_not_called()
+
+    @pytest.mark.parametrize(
+        "existing_count",
+        [
+            pytest.param(1, id="single"),
+            pytest.param(competitor_analyzer.SMALL_MERGE_THRESHOLD - 1, id="list-scan"),
+            pytest.param(competitor_analyzer.SMALL_MERGE_THRESHOLD, id="set-lookup"),
+            pytest.param(
+                competitor_analyzer.SMALL_MERGE_THRESHOLD * 3, id="set-lookup-large"
+            ),
+        ],
+    )
+    def test_dedupe_either_side_of_threshold(self, existing_count: int):
+        """Dedupe by ID gives the same result for the list scan and the set."""
+        existing = [{"id": f"a{i}"} for i in range(existing_count)]
+        data = {"competitors": [*existing, "junk"]}
+        manual = {
+            "a0": {"id": "a0", "source": "manual"},
+            "m1": {"id": "m1", "source": "manual"},
+        }
+
+        CompetitorAnalyzer._add_manual_competitors(data, manual)
+
+        ids = [c["id"] for c in data["competitors"] if isinstance(c, dict)]
+        assert ids == [f"a{i}" for i in range(existing_count)] + ["m1"]
+        assert data["competitors"][0] == {"id": "a0"}
@@ -13,36 +13,184 @@ Tests the dependency_strategy.py and models.py functionality including:
 - symlink_node_modules_to_worktree() backward compatibility
 """
 
+import dataclasses
+import os
 from pathlib import Path
 from unittest.mock import patch
 
 import pytest
 
+from analysis.analyzers.service_analyzer import ServiceAnalyzer
+from core.platform import is_windows
 from core.workspace.dependency_strategy import (
     DEFAULT_STRATEGY_MAP,
     get_dependency_configs,
 )
 from core.workspace.models import DependencyShareConfig, DependencyStrategy
+from core.workspace.setup import (
+    VENV_SETUP_COMPLETE_MARKER,
+    _apply_recreate_strategy,
+    _check_venv_health,
+    setup_worktree_dependencies,
+    symlink_node_modules_to_worktree,
+)
 
+# Symlink creation on Windows needs admin rights or Developer Mode
+requires_symlinks = pytest.mark.skipif(
+    is_windows() or not hasattr(os, "symlink"),
+    reason="Requires unprivileged symlink creation",
+)
+
+
+# _apply_recreate_strategy() only reads its config, so one instance is shared
+_RECREATE_VENV_CFG = DependencyShareConfig(
+    dep_type=".venv",
+    strategy=DependencyStrategy.RECREATE,
+    source_rel_path=".venv",
+)
 
-class TestDependencyStrategy:
-    """Tests for DependencyStrategy enum."""
 
-    def test_enum_has_symlink(self):
-        """SYMLINK strategy exists."""
-        assert DependencyStrategy.SYMLINK.value == "symlink"
+def _mkdirs(base: Path, rel_paths: list[str]) -> None:
+    """Create each of *rel_paths* (and any missing parents) under *base*."""
+    for rel_path in rel_paths:
+        os.makedirs(base / rel_path, exist_ok=True)
+
+
+def _assert_symlinked(results: dict[str, list[str]], dep: str, target: Path) -> None:
+    """Assert *dep* is reported as symlinked and its link exists at *target*."""
+    assert dep in results.get("symlink", [])
+    assert target.exists() or target.is_symlink()
+
+
+# project_dir comes from conftest.py; the fixtures below build the rest of
+# the project/worktree scaffolding shared by the setup tests.
+
+
+@pytest.fixture
+def worktree_path(project_dir: Path) -> Path:
+    """Create an empty worktree directory next to project_dir."""
+    worktree = project_dir.parent / "worktree"
+    worktree.mkdir()
+    return worktree
+
+
+@pytest.fixture(scope="module")
+def shared_project_dir(tmp_path_factory: pytest.TempPathFactory) -> Path:
+    """Project with a populated node_modules, built once per module.
+
+    Only for tests that treat the project as read-only: symlinking into a
+    worktree leaves the source untouched. Tests that add or remove files
+    under the project use project_dir instead.
+    """
+    project = tmp_path_factory.mktemp("project")
+    _mkdirs(project, ["node_modules/react"])
+    return project
+
+
+@pytest.fixture
+def fresh_worktree_path(tmp_path: Path) -> Path:
+    """Create an empty per-test worktree for use with shared_project_dir."""
+    worktree = tmp_path / "worktree"
+    worktree.mkdir()
+    return worktree
+
+
+@pytest.fixture
+def node_modules_index() -> dict:
+    """Project index with a single root-level node_modules location."""
+    return {
+        "dependency_locations": [
+            {"type": "node_modules", "path": "node_modules", "service": "frontend"},
+        ]
+    }
+
+
+@pytest.fixture
+def venv_index() -> dict:
+    """Project index with a single root-level .venv location."""
+    return {
+        "dependency_locations": [
+            {"type": ".venv", "path": ".venv", "service": "backend"},
+        ]
+    }
+
+
+@pytest.fixture
+def service_analyzer(tmp_path: Path) -> ServiceAnalyzer:
+    """ServiceAnalyzer rooted at tmp_path, with a fresh analysis dict."""
+    return ServiceAnalyzer(tmp_path, "service")
+
+
+# get_dependency_configs() never mutates its input, so the indexes below are
+# built once per module and shared across tests.
+
+
+@pytest.fixture(scope="module")
+def node_modules_venv_index() -> dict:
+    """Project index with a frontend node_modules and a backend venv."""
+    return {
+        "dependency_locations": [
+            {"type": "node_modules", "path": "node_modules", "service": "frontend"},
+            {
+                "type": "venv",
+                "path": "apps/backend/.venv",
+                "requirements_file": "requirements.txt",
+                "package_manager": "uv",
+                "service": "backend",
+            },
+        ]
+    }
+
+
+@pytest.fixture(scope="module")
+def multi_service_venv_index() -> dict:
+    """Project index with two Python services, each owning a venv."""
+    return {
+        "dependency_locations": [
+            {
+                "type": "venv",
+                "path": "services/api/.venv",
+                "requirements_file": "requirements.txt",
+                "package_manager": "pip",
+                "service": "api",
+            },
+            {
+                "type": "venv",
+                "path": "services/worker/.venv",
+                "requirements_file": "pyproject.toml",
+                "package_manager": "uv",
+                "service": "worker",
+            },
+        ]
+    }
+
+
+@pytest.fixture(scope="module")
+def duplicate_path_index() -> dict:
+    """Project index where two services report the same node_modules path."""
+    return {
+        "dependency_locations": [
+            {"type": "node_modules", "path": "node_modules", "service": "frontend"},
+            {"type": "node_modules", "path": "node_modules", "service": "storybook"},
+        ]
+    }
 
-    def test_enum_has_recreate(self):
-        """RECREATE strategy exists."""
-        assert DependencyStrategy.RECREATE.value == "recreate"
 
-    def test_enum_has_copy(self):
-        """COPY strategy exists."""
-        assert DependencyStrategy.COPY.value == "copy"
+class TestDependencyStrategy:
+    """Tests for DependencyStrategy enum."""
 
-    def test_enum_has_skip(self):
-        """SKIP strategy exists."""
-        assert DependencyStrategy.SKIP.value == "skip"
+    @pytest.mark.parametrize(
+        "member,value",
+        [
+            ("SYMLINK", "symlink"),
+            ("RECREATE", "recreate"),
+            ("COPY", "copy"),
+            ("SKIP", "skip"),
+        ],
+    )
+    def test_enum_value(self, member, value):
+        """Each strategy exists with its string value."""
+        assert DependencyStrategy[member].value == value
 
     def test_enum_has_exactly_four_members(self):
         """Enum has exactly 4 strategies."""
@@ -52,86 +200,76 @@ class TestDependencyStrategy:
 class TestDependencyShareConfig:
     """Tests for DependencyShareConfig dataclass."""
 
-    def test_create_with_required_fields(self):
-        """Config creates with required fields only."""
-        config = DependencyShareConfig(
-            dep_type="node_modules",
-            strategy=DependencyStrategy.SYMLINK,
-            source_rel_path="node_modules",
-        )
-        assert config.dep_type == "node_modules"
-        assert config.strategy == DependencyStrategy.SYMLINK
-        assert config.source_rel_path == "node_modules"
-        assert config.requirements_file is None
-        assert config.package_manager is None
-
-    def test_create_with_all_fields(self):
-        """Config creates with all fields populated."""
-        config = DependencyShareConfig(
-            dep_type="venv",
-            strategy=DependencyStrategy.SYMLINK,
-            source_rel_path=".venv",
-            requirements_file="requirements.txt",
-            package_manager="uv",
-        )
-        assert config.dep_type == "venv"
-        assert config.strategy == DependencyStrategy.SYMLINK
-        assert config.source_rel_path == ".venv"
-        assert config.requirements_file == "requirements.txt"
-        assert config.package_manager == "uv"
+    @pytest.mark.parametrize(
+        "kwargs,expected",
+        [
+            pytest.param(
+                {
+                    "dep_type": "node_modules",
+                    "strategy": DependencyStrategy.SYMLINK,
+                    "source_rel_path": "node_modules",
+                },
+                {
+                    "dep_type": "node_modules",
+                    "strategy": DependencyStrategy.SYMLINK,
+                    "source_rel_path": "node_modules",
+                    "requirements_file": None,
+                    "package_manager": None,
+                },
+                id="required-fields-only",
+            ),
+            pytest.param(
+                {
+                    "dep_type": "venv",
+                    "strategy": DependencyStrategy.SYMLINK,
+                    "source_rel_path": ".venv",
+                    "requirements_file": "requirements.txt",
+                    "package_manager": "uv",
+                },
+                {
+                    "dep_type": "venv",
+                    "strategy": DependencyStrategy.SYMLINK,
+                    "source_rel_path": ".venv",
+                    "requirements_file": "requirements.txt",
+                    "package_manager": "uv",
+                },
+                id="all-fields",
+            ),
+        ],
+    )
+    def test_create(self, kwargs: dict, expected: dict):
+        """Config creates from kwargs; omitted optional fields default to None."""
+        config = DependencyShareConfig(**kwargs)
+        assert dataclasses.asdict(config) == expected
 
 
 class TestDefaultStrategyMap:
     """Tests for DEFAULT_STRATEGY_MAP."""
 
-    def test_node_modules_is_symlink(self):
-        """node_modules maps to SYMLINK."""
-        assert DEFAULT_STRATEGY_MAP["node_modules"] == DependencyStrategy.SYMLINK
-
-    def test_venv_is_symlink(self):
-        """venv maps to SYMLINK (fast worktree creation with health check fallback)."""
-        assert DEFAULT_STRATEGY_MAP["venv"] == DependencyStrategy.SYMLINK
-
-    def test_dot_venv_is_symlink(self):
-        """.venv maps to SYMLINK (fast worktree creation with health check fallback)."""
-        assert DEFAULT_STRATEGY_MAP[".venv"] == DependencyStrategy.SYMLINK
-
-    def test_vendor_php_is_symlink(self):
-        """vendor_php maps to SYMLINK."""
-        assert DEFAULT_STRATEGY_MAP["vendor_php"] == DependencyStrategy.SYMLINK
-
-    def test_vendor_bundle_is_symlink(self):
-        """vendor_bundle maps to SYMLINK."""
-        assert DEFAULT_STRATEGY_MAP["vendor_bundle"] == DependencyStrategy.SYMLINK
-
-    def test_cargo_target_is_skip(self):
-        """cargo_target maps to SKIP."""
-        assert DEFAULT_STRATEGY_MAP["cargo_target"] == DependencyStrategy.SKIP
-
-    def test_go_modules_is_skip(self):
-        """go_modules maps to SKIP."""
-        assert DEFAULT_STRATEGY_MAP["go_modules"] == DependencyStrategy.SKIP
+    @pytest.mark.parametrize(
+        "key,expected",
+        [
+            ("node_modules", DependencyStrategy.SYMLINK),
+            # venvs symlink for fast worktree creation (health check fallback)
+            ("venv", DependencyStrategy.SYMLINK),
+            (".venv", DependencyStrategy.SYMLINK),
+            ("vendor_php", DependencyStrategy.SYMLINK),
+            ("vendor_bundle", DependencyStrategy.SYMLINK),
+            ("cargo_target", DependencyStrategy.SKIP),
+            ("go_modules", DependencyStrategy.SKIP),
+        ],
+    )
+    def test_default_strategy_map(self, key, expected):
+        """Each dependency type maps to its expected strategy."""
+        assert DEFAULT_STRATEGY_MAP[key] == expected
 
 
 class TestGetDependencyConfigs:
     """Tests for get_dependency_configs()."""
 
-    def test_with_mock_project_index(self):
+    def test_with_mock_project_index(self, node_modules_venv_index: dict):
         """Returns correct strategy per dependency type from project index."""
-        project_index = {
-            "dependency_locations": [
-                {"type": "node_modules", "path": "node_modules", "service": "frontend"},
-                {
-                    "type": "venv",
-                    "path": "apps/backend/.venv",
-                    "requirements_file": "requirements.txt",
-                    "package_manager": "uv",
-                    "service": "backend",
-                },
-            ]
-        }
-
-        configs = get_dependency_configs(project_index)
+        configs = get_dependency_configs(node_modules_venv_index)
 
         assert len(configs) == 2
 
@@ -143,9 +281,29 @@ class TestGetDependencyConfigs:
         assert by_type["venv"].requirements_file == "requirements.txt"
         assert by_type["venv"].package_manager == "uv"
 
-    def test_none_returns_fallback(self):
-        """None project_index returns fallback node_modules configs."""
-        configs = get_dependency_configs(None)
+    @pytest.mark.parametrize(
+        "project_index",
+        [
+            pytest.param(None, id="none"),
+            pytest.param(
+                {"services": {"frontend": {"language": "typescript"}}},
+                id="missing-dependency-locations",
+            ),
+            pytest.param({"dependency_locations": []}, id="empty-dependency-locations"),
+            # Only top-level dependency_locations count; per-service ones don't
+            pytest.param(
+                {
+                    "services": {
+                        "backend": {"language": "python", "dependency_locations": []}
+                    }
+                },
+                id="service-level-dependency-locations-only",
+            ),
+        ],
+    )
+    def test_fallback(self, project_index):
+        """Index without top-level dependency_locations returns fallback configs."""
+        configs = get_dependency_configs(project_index)
 
         assert len(configs) == 2
         assert configs[0].dep_type == "node_modules"
@@ -154,29 +312,6 @@ class TestGetDependencyConfigs:
         assert configs[1].dep_type == "node_modules"
         assert configs[1].source_rel_path == "apps/frontend/node_modules"
 
-    def test_missing_dependency_locations_returns_fallback(self):
-        """Project index without dependency_locations returns fallback."""
-        project_index = {
-            "services": {
-                "frontend": {
-                    "language": "typescript",
-                }
-            }
-        }
-
-        configs = get_dependency_configs(project_index)
-
-        assert len(configs) == 2
-        assert configs[0].dep_type == "node_modules"
-        assert configs[0].strategy == DependencyStrategy.SYMLINK
-
-    def test_empty_dependency_locations_returns_fallback(self):
-        """Project index with empty dependency_locations returns fallback."""
-        configs = get_dependency_configs({"dependency_locations": []})
-
-        assert len(configs) == 2
-        assert configs[0].dep_type == "node_modules"
-
     def test_unknown_dep_type_defaults_to_skip(self):
         """Unknown dependency type defaults to SKIP strategy."""
         project_index = {
@@ -191,45 +326,11 @@ class TestGetDependencyConfigs:
         assert configs[0].dep_type == "unknown_ecosystem"
         assert configs[0].strategy == DependencyStrategy.SKIP
 
-    def test_no_dependency_locations_returns_fallback(self):
-        """Project index with no dependency_locations falls back."""
-        project_index = {
-            "services": {
-                "backend": {
-                    "language": "python",
-                    "dependency_locations": [],
-                }
-            }
-        }
-
-        # No top-level dependency_locations means fallback
-        configs = get_dependency_configs(project_index)
-
-        assert len(configs) == 2
-        assert configs[0].dep_type == "node_modules"
-
-    def test_multiple_python_services_own_venv_configs(self):
+    def test_multiple_python_services_own_venv_configs(
+        self, multi_service_venv_index: dict
+    ):
         """Multiple Python services each get their own venv config with correct paths."""
-        project_index = {
-            "dependency_locations": [
-                {
-                    "type": "venv",
-                    "path": "services/api/.venv",
-                    "requirements_file": "requirements.txt",
-                    "package_manager": "pip",
-                    "service": "api",
-                },
-                {
-                    "type": "venv",
-                    "path": "services/worker/.venv",
-                    "requirements_file": "pyproject.toml",
-                    "package_manager": "uv",
-                    "service": "worker",
-                },
-            ]
-        }
-
-        configs = get_dependency_configs(project_index)
+        configs = get_dependency_configs(multi_service_venv_index)
 
         assert len(configs) == 2
 
@@ -247,67 +348,29 @@ class TestGetDependencyConfigs:
         assert worker_config.package_manager == "uv"
         assert worker_config.requirements_file == "pyproject.toml"
 
-    def test_deduplicates_by_path(self):
+    def test_deduplicates_by_path(self, duplicate_path_index: dict):
         """Duplicate paths are deduplicated."""
-        project_index = {
-            "dependency_locations": [
-                {"type": "node_modules", "path": "node_modules", "service": "frontend"},
-                {"type": "node_modules", "path": "node_modules", "service": "storybook"},
-            ]
-        }
-
-        configs = get_dependency_configs(project_index)
+        configs = get_dependency_configs(duplicate_path_index)
 
         assert len(configs) == 1
         assert configs[0].dep_type == "node_modules"
 
-    def test_path_traversal_rejected(self):
-        """Paths with '..' components are rejected for containment safety."""
-        project_index = {
-            "dependency_locations": [
-                {"type": "node_modules", "path": "../../etc/passwd", "service": "evil"},
-                {"type": "node_modules", "path": "safe/node_modules", "service": "ok"},
-            ]
-        }
-
-        configs = get_dependency_configs(project_index)
-
-        assert len(configs) == 1
-        assert configs[0].source_rel_path == "safe/node_modules"
-
-    def test_windows_backslash_traversal_rejected(self):
-        """Windows-style backslash traversals are rejected."""
-        project_index = {
-            "dependency_locations": [
-                {"type": "node_modules", "path": "..\\..\\evil", "service": "evil"},
-                {"type": "node_modules", "path": "safe/node_modules", "service": "ok"},
-            ]
-        }
-
-        configs = get_dependency_configs(project_index)
-
-        assert len(configs) == 1
-        assert configs[0].source_rel_path == "safe/node_modules"
-
-    def test_absolute_posix_path_rejected(self):
-        """Absolute POSIX paths are rejected."""
-        project_index = {
-            "dependency_locations": [
-                {"type": "node_modules", "path": "/etc/passwd", "service": "evil"},
-                {"type": "node_modules", "path": "safe/node_modules", "service": "ok"},
-            ]
-        }
-
-        configs = get_dependency_configs(project_index)
-
-        assert len(configs) == 1
-        assert configs[0].source_rel_path == "safe/node_modules"
-
-    def test_absolute_windows_path_rejected(self):
-        """Absolute Windows paths are rejected."""
+    @pytest.mark.parametrize(
+        "bad_path",
+        [
+            "../../etc/passwd",  # POSIX traversal
+            "..\\..\\evil",  # Windows backslash traversal
+            "/etc/passwd",  # absolute POSIX path
+            "C:\\Windows",  # absolute Windows path
+            "C:..\\evil",  # Windows drive-relative traversal
+            "\\evil",  # Windows drive-rooted path
+        ],
+    )
+    def test_unsafe_path_rejected(self, bad_path):
+        """Absolute paths and '..' traversals are rejected for containment safety."""
         project_index = {
             "dependency_locations": [
-                {"type": "node_modules", "path": "C:\\Windows", "service": "evil"},
+                {"type": "node_modules", "path": bad_path, "service": "evil"},
                 {"type": "node_modules", "path": "safe/node_modules", "service": "ok"},
             ]
         }
@@ -317,14 +380,15 @@ class TestGetDependencyConfigs:
         assert len(configs) == 1
         assert configs[0].source_rel_path == "safe/node_modules"
 
-    def test_requirements_file_traversal_rejected(self):
-        """requirements_file with '..' traversal is nullified."""
+    @pytest.mark.parametrize("bad_path", ["../../etc/passwd", "/etc/passwd"])
+    def test_unsafe_requirements_file_rejected(self, bad_path):
+        """requirements_file with '..' traversal or an absolute path is nullified."""
         project_index = {
             "dependency_locations": [
                 {
                     "type": "venv",
                     "path": ".venv",
-                    "requirements_file": "../../etc/passwd",
+                    "requirements_file": bad_path,
                     "service": "evil",
                 },
             ]
@@ -336,24 +400,6 @@ class TestGetDependencyConfigs:
         assert configs[0].source_rel_path == ".venv"
         assert configs[0].requirements_file is None
 
-    def test_requirements_file_absolute_path_rejected(self):
-        """requirements_file with absolute path is nullified."""
-        project_index = {
-            "dependency_locations": [
-                {
-                    "type": "venv",
-                    "path": ".venv",
-                    "requirements_file": "/etc/passwd",
-                    "service": "evil",
-                },
-            ]
-        }
-
-        configs = get_dependency_configs(project_index)
-
-        assert len(configs) == 1
-        assert configs[0].requirements_file is None
-
     def test_requirements_file_valid_preserved(self):
         """Valid requirements_file is preserved."""
         project_index = {
@@ -373,6 +419,7 @@ class TestGetDependencyConfigs:
         assert len(configs) == 1
         assert configs[0].requirements_file == "requirements.txt"
 
+    @requires_symlinks
     def test_resolved_path_containment_with_project_dir(self, tmp_path):
         """Resolved-path containment check rejects escaping paths when project_dir is set."""
         # Create a symlink inside tmp_path that points outside it
@@ -410,6 +457,7 @@ class TestGetDependencyConfigs:
         assert len(configs) == 1
         assert configs[0].source_rel_path == "node_modules"
 
+    @requires_symlinks
     def test_resolved_requirements_file_containment_with_project_dir(self, tmp_path):
         """Resolved-path containment rejects requirements_file escaping project_dir."""
         # Create a symlink that escapes project_dir
@@ -439,114 +487,132 @@ class TestGetDependencyConfigs:
 class TestServiceAnalyzerDependencyLocations:
     """Tests for ServiceAnalyzer._detect_dependency_locations()."""
 
-    def test_detects_node_modules_when_package_json_exists(self, tmp_path: Path):
-        """Detects node_modules directory when package.json exists."""
-        from analysis.analyzers.service_analyzer import ServiceAnalyzer
-
-        (tmp_path / "package.json").write_text("{}")
-        (tmp_path / "node_modules").mkdir()
-
-        analyzer = ServiceAnalyzer(tmp_path, "frontend")
-        analyzer._detect_dependency_locations()
-
-        locations = analyzer.analysis["dependency_locations"]
-        node_entry = next(l for l in locations if l["type"] == "node_modules")
-        assert node_entry["exists"] is True
-        assert node_entry["path"] == "node_modules"
-
-    def test_detects_venv_when_requirements_txt_exists(self, tmp_path: Path):
-        """Detects .venv directory when requirements.txt exists."""
-        from analysis.analyzers.service_analyzer import ServiceAnalyzer
-
-        (tmp_path / "requirements.txt").write_text("flask")
-        (tmp_path / ".venv").mkdir()
-
-        analyzer = ServiceAnalyzer(tmp_path, "backend")
-        analyzer._detect_dependency_locations()
-
-        locations = analyzer.analysis["dependency_locations"]
-        venv_entry = next(l for l in locations if l["type"] == "venv")
-        assert venv_entry["exists"] is True
-        assert venv_entry["path"] == ".venv"
-        assert venv_entry["requirements_file"] == "requirements.txt"
-
-    def test_returns_no_local_deps_for_go_project(self, tmp_path: Path):
-        """Returns no dependency locations for Go project with no package.json."""
-        from analysis.analyzers.service_analyzer import ServiceAnalyzer
-
-        (tmp_path / "go.mod").write_text("module example.com/app")
-
-        analyzer = ServiceAnalyzer(tmp_path, "goapp")
-        analyzer._detect_dependency_locations()
-
-        locations = analyzer.analysis["dependency_locations"]
-        # No entries — node_modules only appears when package.json exists
-        assert len(locations) == 0
+    @pytest.mark.parametrize(
+        "files,dirs,expected",
+        [
+            pytest.param(
+                ["package.json"],
+                ["node_modules"],
+                {"node_modules": {"path": "node_modules", "exists": True}},
+                id="node_modules-with-package-json",
+            ),
+            pytest.param(
+                ["requirements.txt"],
+                [".venv"],
+                {
+                    "venv": {
+                        "path": ".venv",
+                        "exists": True,
+                        "requirements_file": "requirements.txt",
+                    }
+                },
+                id="venv-with-requirements-txt",
+            ),
+            # No entries — node_modules only appears when package.json exists
+            pytest.param(
+                ["go.mod"],
+                [],
+                {},
+                id="go-project-no-local-deps",
+            ),
+        ],
+    )
+    def test_detects_dependency_locations(
+        self,
+        tmp_path: Path,
+        service_analyzer: ServiceAnalyzer,
+        files: list,
+        dirs: list,
+        expected: dict,
+    ):
+        """Detects dependency dirs based on the manifest files present."""
+        # Detection only checks that a manifest exists, so empty files suffice
+        for name in files:
+            (tmp_path / name).touch()
+        for name in dirs:
+            (tmp_path / name).mkdir()
+
+        service_analyzer._detect_dependency_locations()
+
+        locations = service_analyzer.analysis["dependency_locations"]
+        assert len(locations) == len(expected)
+
+        by_type = {loc["type"]: loc for loc in locations}
+        for dep_type, fields in expected.items():
+            for key, value in fields.items():
+                assert by_type[dep_type][key] == value
 
 
 class TestSetupWorktreeDependencies:
     """Tests for setup_worktree_dependencies()."""
 
-    def test_symlink_created_for_node_modules(self, tmp_path: Path):
-        """SYMLINK strategy creates symlink for node_modules."""
-        from core.workspace.setup import setup_worktree_dependencies
-
-        project_dir = tmp_path / "project"
-        project_dir.mkdir()
-        (project_dir / "node_modules").mkdir()
-        (project_dir / "node_modules" / "react").mkdir()
-
-        worktree_path = tmp_path / "worktree"
-        worktree_path.mkdir()
-
-        project_index = {
-            "dependency_locations": [
-                {"type": "node_modules", "path": "node_modules", "service": "frontend"},
-            ]
-        }
-
-        results = setup_worktree_dependencies(project_dir, worktree_path, project_index)
+    @pytest.mark.parametrize(
+        "target_exists",
+        [
+            pytest.param(False, id="symlink-created"),
+            pytest.param(True, id="existing-target-skipped-gracefully"),
+        ],
+    )
+    def test_node_modules_symlink_dispatch(
+        self,
+        shared_project_dir: Path,
+        fresh_worktree_path: Path,
+        node_modules_index: dict,
+        target_exists: bool,
+    ):
+        """SYMLINK strategy links node_modules unless the target already exists."""
+        target = fresh_worktree_path / "node_modules"
+        if target_exists:
+            target.mkdir()
+
+        results = setup_worktree_dependencies(
+            shared_project_dir, fresh_worktree_path, node_modules_index
+        )
 
-        assert "symlink" in results
-        assert "node_modules" in results["symlink"]
-        target = worktree_path / "node_modules"
+        if target_exists:
+            # Target is still a real directory, not a symlink
+            assert "node_modules" not in results["symlink"]
+            assert target.is_dir()
+            assert not target.is_symlink()
+        else:
+            _assert_symlinked(results, "node_modules", target)
+
+    @pytest.mark.parametrize(
+        "invoke",
+        [
+            pytest.param(
+                lambda pd, wp: setup_worktree_dependencies(pd, wp, None)["symlink"],
+                id="none-project-index-uses-fallback",
+            ),
+            # Backward-compatible wrapper still works
+            pytest.param(
+                symlink_node_modules_to_worktree,
+                id="symlink_node_modules_to_worktree",
+            ),
+        ],
+    )
+    def test_node_modules_fallback_entry_points(
+        self, shared_project_dir: Path, fresh_worktree_path: Path, invoke
+    ):
+        """Both fallback entry points symlink the root node_modules."""
+        symlinked = invoke(shared_project_dir, fresh_worktree_path)
+
+        assert isinstance(symlinked, list)
+        assert "node_modules" in symlinked
+        # Windows links with a junction, which is_symlink() doesn't report
+        target = fresh_worktree_path / "node_modules"
         assert target.exists() or target.is_symlink()
 
-    def test_none_project_index_uses_fallback(self, tmp_path: Path):
-        """None project_index uses fallback node_modules behavior."""
-        from core.workspace.setup import setup_worktree_dependencies
-
-        project_dir = tmp_path / "project"
-        project_dir.mkdir()
-        (project_dir / "node_modules").mkdir()
-
-        worktree_path = tmp_path / "worktree"
-        worktree_path.mkdir()
-
-        results = setup_worktree_dependencies(project_dir, worktree_path, None)
-
-        assert "symlink" in results
-        assert "node_modules" in results["symlink"]
-
-    def test_source_missing_skipped_gracefully(self, tmp_path: Path):
+    def test_source_missing_skipped_gracefully(
+        self, project_dir: Path, worktree_path: Path, node_modules_index: dict
+    ):
         """Source dependency that doesn't exist is skipped gracefully."""
-        from core.workspace.setup import setup_worktree_dependencies
-
-        project_dir = tmp_path / "project"
-        project_dir.mkdir()
         # No node_modules directory created
 
-        worktree_path = tmp_path / "worktree"
-        worktree_path.mkdir()
-
-        project_index = {
-            "dependency_locations": [
-                {"type": "node_modules", "path": "node_modules", "service": "frontend"},
-            ]
-        }
-
         # Should not raise
-        results = setup_worktree_dependencies(project_dir, worktree_path, project_index)
+        results = setup_worktree_dependencies(
+            project_dir, worktree_path, node_modules_index
+        )
 
         # Source missing → no work performed, so not recorded in results
         symlink_results = results.get("symlink", [])
@@ -554,89 +620,67 @@ class TestSetupWorktreeDependencies:
         # No symlink was created
         assert not (worktree_path / "node_modules").exists()
 
-    def test_target_already_exists_skipped_gracefully(self, tmp_path: Path):
-        """Target that already exists is skipped gracefully."""
-        from core.workspace.setup import setup_worktree_dependencies
-
-        project_dir = tmp_path / "project"
-        project_dir.mkdir()
-        (project_dir / "node_modules").mkdir()
-
-        worktree_path = tmp_path / "worktree"
-        worktree_path.mkdir()
-        # Pre-create target
-        (worktree_path / "node_modules").mkdir()
-
-        project_index = {
-            "dependency_locations": [
-                {"type": "node_modules", "path": "node_modules", "service": "frontend"},
-            ]
-        }
-
-        # Should not raise
-        results = setup_worktree_dependencies(project_dir, worktree_path, project_index)
-
-        assert "symlink" in results
-        # Target is still a real directory, not a symlink
-        assert (worktree_path / "node_modules").is_dir()
-        assert not (worktree_path / "node_modules").is_symlink()
-
 
 class TestVenvSymlinkWithHealthCheck:
-    """Tests for venv symlink strategy with health check and fallback to recreate."""
+    """Tests for venv symlink strategy with health check and fallback to recreate.
 
-    def test_venv_symlinked_when_source_exists(self, tmp_path: Path):
-        """Venv is symlinked (not recreated) when source venv exists."""
-        from core.workspace.setup import setup_worktree_dependencies
+    The health check and the recreate step are patched out so these tests only
+    exercise the dispatch logic, not real interpreters or venv creation.
+    """
 
-        project_dir = tmp_path / "project"
-        project_dir.mkdir()
-        venv_dir = project_dir / ".venv"
-        venv_dir.mkdir()
+    def test_venv_symlinked_when_source_exists(
+        self, project_dir: Path, worktree_path: Path, venv_index: dict
+    ):
+        """Venv is symlinked (not recreated) when health check passes."""
         # Create a minimal venv structure so the symlink target looks real
-        (venv_dir / "bin").mkdir()
-        (venv_dir / "lib").mkdir()
-
-        worktree_path = tmp_path / "worktree"
-        worktree_path.mkdir()
-
-        project_index = {
-            "dependency_locations": [
-                {"type": ".venv", "path": ".venv", "service": "backend"},
-            ]
-        }
-
-        results = setup_worktree_dependencies(project_dir, worktree_path, project_index)
+        _mkdirs(project_dir, [".venv/bin", ".venv/lib"])
+
+        with (
+            patch(
+                "core.workspace.setup._check_venv_health", return_value=True
+            ) as mock_health_check,
+            patch("core.workspace.setup._apply_recreate_strategy") as mock_recreate,
+        ):
+            results = setup_worktree_dependencies(
+                project_dir, worktree_path, venv_index
+            )
 
         target = worktree_path / ".venv"
-        # The symlink should have been created (regardless of health check outcome)
-        assert target.exists() or target.is_symlink()
+        mock_health_check.assert_called_once_with(target)
+        mock_recreate.assert_not_called()
+        _assert_symlinked(results, ".venv", target)
 
-    def test_venv_health_check_fallback_to_recreate(self, tmp_path: Path):
+    def test_venv_health_check_fallback_to_recreate(
+        self, project_dir: Path, worktree_path: Path, venv_index: dict
+    ):
         """When symlinked venv health check fails, falls back to recreate."""
-        from core.workspace.setup import setup_worktree_dependencies
-
-        project_dir = tmp_path / "project"
-        project_dir.mkdir()
         # Create a source venv that has no python binary (health check will fail)
-        venv_dir = project_dir / ".venv"
-        venv_dir.mkdir()
-
-        worktree_path = tmp_path / "worktree"
-        worktree_path.mkdir()
-
-        project_index = {
-            "dependency_locations": [
-                {"type": ".venv", "path": ".venv", "service": "backend"},
-            ]
-        }
-
-        # This should symlink, then health check fails (no python binary),
-        # then fall back to recreate (which will also fail since no real python
-        # in source). The important thing is it doesn't raise.
-        results = setup_worktree_dependencies(project_dir, worktree_path, project_index)
-        # Should not crash
-        assert isinstance(results, dict)
+        (project_dir / ".venv").mkdir()
+
+        with (
+            patch(
+                "core.workspace.setup._check_venv_health", return_value=False
+            ) as mock_health_check,
+            patch(
+                "core.workspace.setup._apply_recreate_strategy", return_value=True
+            ) as mock_recreate,
+        ):
+            results = setup_worktree_dependencies(
+                project_dir, worktree_path, venv_index
+            )
+
+        mock_health_check.assert_called_once()
+        mock_recreate.assert_called_once()
+        # The broken symlink is removed before recreating
+        assert not (worktree_path / ".venv").is_symlink()
+        assert results.get("recreate") == [".venv"]
+        assert ".venv" not in results["symlink"]
+
+    def test_health_check_fails_without_python_binary(self, project_dir: Path):
+        """_check_venv_health() reports a venv with no interpreter as unhealthy."""
+        (project_dir / ".venv").mkdir()
+
+        assert _check_venv_health(project_dir / ".venv") is False
 
 
 class TestRecreateStrategyMarker:
@@ -644,50 +688,29 @@ class TestRecreateStrategyMarker:
 
     def test_marker_constant_defined(self):
         """VENV_SETUP_COMPLETE_MARKER is defined."""
-        from core.workspace.setup import VENV_SETUP_COMPLETE_MARKER
         assert VENV_SETUP_COMPLETE_MARKER == ".setup_complete"
 
-    def test_incomplete_venv_detected_and_removed(self, tmp_path: Path):
-        """Venv without marker is detected as incomplete."""
-        from core.workspace.setup import _apply_recreate_strategy, VENV_SETUP_COMPLETE_MARKER
-        from core.workspace.models import DependencyShareConfig, DependencyStrategy
-
-        project_dir = tmp_path / "project"
-        project_dir.mkdir()
-        worktree_path = tmp_path / "worktree"
-        worktree_path.mkdir()
-
+    def test_incomplete_venv_detected_and_removed(
+        self, project_dir: Path, worktree_path: Path
+    ):
+        """Venv without marker is detected as incomplete and removed before rebuild."""
         # Create an incomplete venv (no marker)
         incomplete_venv = worktree_path / ".venv"
-        incomplete_venv.mkdir()
-        (incomplete_venv / "bin").mkdir()
-
-        config = DependencyShareConfig(
-            dep_type=".venv",
-            strategy=DependencyStrategy.RECREATE,
-            source_rel_path=".venv",
-        )
+        _mkdirs(worktree_path, [".venv/bin"])
 
-        # Will try to recreate (remove incomplete + rebuild). May fail due to
-        # no real python, but the incomplete venv should be removed.
-        _apply_recreate_strategy(project_dir, worktree_path, config)
+        # Patch out the actual `python -m venv` so only the removal is exercised
+        with patch(
+            "core.workspace.setup._popen_with_cleanup", return_value=(0, "", "")
+        ) as mock_popen:
+            _apply_recreate_strategy(project_dir, worktree_path, _RECREATE_VENV_CFG)
 
-        # The incomplete venv without marker should have been removed
-        # (recreation may or may not succeed depending on Python availability)
-        if incomplete_venv.exists():
-            # If it was recreated successfully, marker should exist
-            assert (incomplete_venv / VENV_SETUP_COMPLETE_MARKER).exists()
+        # The incomplete venv was removed before the rebuild was attempted
+        assert not (incomplete_venv / "bin").exists()
+        mock_popen.assert_called_once()
+        assert mock_popen.call_args.args[0][1:] == ["-m", "venv", str(incomplete_venv)]
 
-    def test_complete_venv_skipped(self, tmp_path: Path):
+    def test_complete_venv_skipped(self, project_dir: Path, worktree_path: Path):
         """Venv with marker is skipped (not rebuilt)."""
-        from core.workspace.setup import _apply_recreate_strategy, VENV_SETUP_COMPLETE_MARKER
-        from core.workspace.models import DependencyShareConfig, DependencyStrategy
-
-        project_dir = tmp_path / "project"
-        project_dir.mkdir()
-        worktree_path = tmp_path / "worktree"
-        worktree_path.mkdir()
-
         # Create a complete venv (with marker)
         complete_venv = worktree_path / ".venv"
         complete_venv.mkdir()
@@ -695,34 +718,10 @@ class TestRecreateStrategyMarker:
         # Add a canary file to verify the venv wasn't rebuilt
         (complete_venv / "canary.txt").write_text("original")
 
-        config = DependencyShareConfig(
-            dep_type=".venv",
-            strategy=DependencyStrategy.RECREATE,
-            source_rel_path=".venv",
+        result = _apply_recreate_strategy(
+            project_dir, worktree_path, _RECREATE_VENV_CFG
         )
 
-        result = _apply_recreate_strategy(project_dir, worktree_path, config)
-
         assert result is False  # Skipped
         # Canary file should still be present (not rebuilt)
         assert (complete_venv / "canary.txt").read_text() == "original"
-
-
-class TestSymlinkNodeModulesToWorktreeBackwardCompat:
-    """Tests for symlink_node_modules_to_worktree() backward compatibility."""
-
-    def test_wrapper_still_works(self, tmp_path: Path):
-        """symlink_node_modules_to_worktree() still works as a wrapper."""
-        from core.workspace.setup import symlink_node_modules_to_worktree
-
-        project_dir = tmp_path / "project"
-        project_dir.mkdir()
-        (project_dir / "node_modules").mkdir()
-
-        worktree_path = tmp_path / "worktree"
-        worktree_path.mkdir()
-
-        result = symlink_node_modules_to_worktree(project_dir, worktree_path)
-
-        assert isinstance(result, list)
-        assert "node_modules" in result